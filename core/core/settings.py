@@ -132,6 +132,13 @@ CSRF_TRUSTED_ORIGINS = [
 
 
 
+# Loads request.user together with its profile, which every request reads.
+# ModelBackend stays listed so sessions created before the switch remain valid.
+AUTHENTICATION_BACKENDS = [
+    'payments.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/submit/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
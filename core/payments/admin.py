@@ -15,6 +15,9 @@ class PaymentActivityInline(admin.TabularInline):
     readonly_fields = ('actor', 'action', 'from_status', 'to_status', 'note', 'created_at')
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('actor')
+
 
 @admin.register(PaymentRecord)
 class PaymentRecordAdmin(admin.ModelAdmin):
@@ -47,10 +50,19 @@ class PaymentRecordAdmin(admin.ModelAdmin):
         'phone',
         'tracking_code',
     )
+    list_select_related = ('counterparty',)
+    list_per_page = 50
+    show_full_result_count = False
+    ordering = ('-pay_date',)
     inlines = [PaymentReceiptInline, PaymentActivityInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('counterparty')
+
+    _format_amount = staticmethod('{:,}'.format)
+
     def formatted_amount(self, obj):
-        return '{:,}'.format(obj.amount)
+        return self._format_amount(obj.amount)
 
     formatted_amount.short_description = 'مبلغ (ریال)'
 
@@ -83,6 +95,7 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'organization', 'city', 'role', 'force_password_change')
     list_filter = ('role', 'city', 'force_password_change')
     search_fields = ('user__username', 'phone')
+    list_select_related = ('user',)
 
 
 @admin.register(Counterparty)
@@ -99,6 +112,10 @@ class PaymentActivityLogAdmin(admin.ModelAdmin):
     list_display = ('payment', 'actor', 'action', 'from_status', 'to_status', 'created_at')
     list_filter = ('action', 'to_status', 'created_at')
     search_fields = ('payment__first_name', 'payment__last_name', 'note', 'actor__username')
+    list_select_related = ('payment', 'actor')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('payment', 'actor')
 
     def has_add_permission(self, request):
         return False
@@ -0,0 +1,21 @@
+from django.core.cache import cache
+
+from .models import Counterparty
+
+# Caches are per process (LocMemCache): signal-driven deletes only clear the worker that
+# handled the save, so other workers may serve the old value until the timeout.
+LOGIN_ADS_CACHE_TIMEOUT = 300
+COUNTERPARTIES_CACHE_KEY = 'counterparties:v1'
+COUNTERPARTIES_CACHE_TIMEOUT = 60
+
+
+def login_ads_cache_key(day):
+    return f'login_ads:{day.isoformat()}'
+
+
+def cached_counterparties():
+    return cache.get_or_set(
+        COUNTERPARTIES_CACHE_KEY,
+        lambda: list(Counterparty.objects.values('id', 'name')),
+        COUNTERPARTIES_CACHE_TIMEOUT,
+    )
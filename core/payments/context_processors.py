@@ -1,18 +1,30 @@
+from django.core.cache import cache
 from django.utils import timezone
 
+from .caching import LOGIN_ADS_CACHE_TIMEOUT, login_ads_cache_key
 from .models import LoginAdvertisement
 
+_SLOTS = (1, 2, 3, 4)
+_EMPTY_SLOT_ADS = tuple({'slot': slot, 'ad': None} for slot in _SLOTS)
+
 
 def login_ads(request):
     today = timezone.localdate()
-    active_ads = (
-        LoginAdvertisement.objects
-        .filter(is_visible=True, start_date__lte=today, end_date__gte=today)
-        .order_by('slot')
-    )
-    by_slot = {ad.slot: ad for ad in active_ads}
-    slot_ads = [{'slot': slot, 'ad': by_slot.get(slot)} for slot in (1, 2, 3, 4)]
+    key = login_ads_cache_key(today)
+    data = cache.get(key)
+    if data is None:
+        active_ads = (
+            LoginAdvertisement.objects
+            .filter(is_visible=True, start_date__lte=today, end_date__gte=today)
+            .only('slot', 'title', 'description', 'image', 'link_url')
+            .order_by('slot')
+        )
+        by_slot = {ad.slot: ad for ad in active_ads}
+        data = {'by_slot': by_slot, 'slot_ads': None}
+        if by_slot:
+            data['slot_ads'] = [{'slot': slot, 'ad': by_slot.get(slot)} for slot in _SLOTS]
+        cache.set(key, data, LOGIN_ADS_CACHE_TIMEOUT)
     return {
-        'login_ads_by_slot': by_slot,
-        'login_slot_ads': slot_ads,
+        'login_ads_by_slot': data['by_slot'],
+        'login_slot_ads': data['slot_ads'] or _EMPTY_SLOT_ADS,
     }
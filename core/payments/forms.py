@@ -1,28 +1,67 @@
 import hashlib
-import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.safestring import mark_safe
 from django_jalali.forms import jDateField, jDateInput
 
-from .models import Counterparty, PaymentRecord
+from .models import Counterparty, PaymentReceipt, PaymentRecord
+
+
+def receipt_hasher():
+    # Content identity only, not authentication: BLAKE2b is cheaper per byte than SHA-256.
+    return hashlib.blake2b(digest_size=32)
+
+
+RECEIPT_HASH_BUFFER_SIZE = 256 * 1024
+
+
+def _receipt_digest(uploaded):
+    # file_digest reads into a reusable buffer; storages without readinto fall back to chunks().
+    uploaded.seek(0)
+    fileobj = uploaded.file
+    if hasattr(hashlib, 'file_digest') and (hasattr(fileobj, 'getbuffer') or hasattr(fileobj, 'readinto')):
+        digest = hashlib.file_digest(fileobj, receipt_hasher)
+    elif hasattr(fileobj, 'readinto'):
+        # Python < 3.11: same reusable-buffer loop as file_digest.
+        digest = receipt_hasher()
+        buffer = bytearray(RECEIPT_HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            size = fileobj.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    else:
+        digest = receipt_hasher()
+        for chunk in uploaded.chunks():
+            digest.update(chunk)
+    uploaded.seek(0)
+    return digest.hexdigest()
 
 
 class MultiFileInput(forms.ClearableFileInput):
     allow_multiple_selected = True
 
 
+@lru_cache(maxsize=None)
+def _required_label(label):
+    return mark_safe(f'{label} <span style="color:#d00;">*</span>')
+
+
 class MultiFileField(forms.FileField):
     def clean(self, data, initial=None):
         if isinstance(data, (list, tuple)):
             if not data:
                 return []
+            parent_clean = super().clean
             cleaned_files = []
             errors = []
             for uploaded in data:
                 try:
-                    cleaned_files.append(super().clean(uploaded, initial))
+                    cleaned_files.append(parent_clean(uploaded, initial))
                 except ValidationError as exc:
                     errors.extend(exc.error_list)
             if errors:
@@ -35,9 +74,13 @@ class MultiFileField(forms.FileField):
 
 class PaymentRecordForm(forms.ModelForm):
     MAX_UPLOAD_SIZE = 1 * 1024 * 1024  # 1 MB
-    ALLOWED_EXTENSIONS = {
+    MAX_HASH_WORKERS = 8
+    RECEIPT_BATCH_SIZE = 50
+    ALLOWED_EXTENSIONS = frozenset({
         '.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff', '.pdf',
-    }
+    })
+    # Browsers send octet-stream for formats they do not recognise (e.g. some TIFFs).
+    ALLOWED_CONTENT_TYPES = ('image/', 'application/pdf', 'application/octet-stream')
     ACCOUNT_FIELDS = ()
     REQUIRED_CUSTOMER_FIELDS = (
         'payer_account_number',
@@ -70,6 +113,7 @@ class PaymentRecordForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._receipt_payload = []
+        self._hash_cache = {}
 
         for name in self.REQUIRED_CUSTOMER_FIELDS:
             self.fields[name].required = True
@@ -93,7 +137,7 @@ class PaymentRecordForm(forms.ModelForm):
 
         for name, field in self.fields.items():
             if field.required and not field.disabled:
-                field.label = mark_safe(f'{field.label} <span style="color:#d00;">*</span>')
+                field.label = _required_label(field.label)
 
     class Meta:
         model = PaymentRecord
@@ -143,37 +187,58 @@ class PaymentRecordForm(forms.ModelForm):
         if not files and not has_existing_files:
             raise ValidationError('حداقل یک فایل فیش لازم است.')
 
-        existing_hashes = set()
-        if self.instance.pk:
-            existing_hashes = set(self.instance.receipts.values_list('file_hash', flat=True))
-
-        payload = []
-        seen_hashes = set()
+        # Run the cheap name/type/size checks on every file before hashing any of them.
         for uploaded in files:
-            ext = os.path.splitext(uploaded.name or '')[1].lower()
-            if ext not in self.ALLOWED_EXTENSIONS:
+            stem, dot, tail = (uploaded.name or '').rpartition('.')
+            ext = dot + tail.lower() if stem else ''
+            content_type = (uploaded.content_type or '').lower()
+            if ext not in self.ALLOWED_EXTENSIONS or (content_type and not content_type.startswith(self.ALLOWED_CONTENT_TYPES)):
                 raise ValidationError('فرمت فایل مجاز نیست. فقط تصویرهای استاندارد و PDF پذیرفته می شود.')
             if uploaded.size and uploaded.size > self.MAX_UPLOAD_SIZE:
                 raise ValidationError('حجم هر فایل باید حداکثر 1 مگابایت باشد.')
 
-            digest = hashlib.sha256()
-            for chunk in uploaded.chunks():
-                digest.update(chunk)
-            file_hash = digest.hexdigest()
-            uploaded.seek(0)
-
-            if file_hash in seen_hashes or file_hash in existing_hashes:
+        payload = []
+        seen_hashes = set()
+        for uploaded, file_hash in zip(files, self._receipt_hashes(files)):
+            if file_hash in seen_hashes:
                 raise ValidationError('فایل تکراری برای این رکورد مجاز نیست.')
 
             seen_hashes.add(file_hash)
             payload.append((uploaded, file_hash))
 
+        if seen_hashes and self.instance.pk and self.instance.receipts.filter(file_hash__in=seen_hashes).exists():
+            raise ValidationError('فایل تکراری برای این رکورد مجاز نیست.')
+
         self._receipt_payload = payload
         return files
 
+    def _receipt_hashes(self, files):
+        # Re-validating the same bound form must not re-read every upload.
+        pending = [uploaded for uploaded in files if (id(uploaded), uploaded.size) not in self._hash_cache]
+        # hashlib releases the GIL while digesting, so several receipts hash in parallel.
+        if len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.MAX_HASH_WORKERS, len(pending))) as executor:
+                digests = list(executor.map(_receipt_digest, pending))
+        else:
+            digests = [_receipt_digest(uploaded) for uploaded in pending]
+        for uploaded, file_hash in zip(pending, digests):
+            self._hash_cache[(id(uploaded), uploaded.size)] = file_hash
+        return [self._hash_cache[(id(uploaded), uploaded.size)] for uploaded in files]
+
     def receipt_payload(self):
         return self._receipt_payload
 
+    def create_receipts(self, payment):
+        # Files are still written one by one by storage; the rows go in a single INSERT.
+        if not self._receipt_payload:
+            return []
+        # clean_receipt_images already rejected known duplicates; a concurrent edit that
+        # attaches the same file in between is skipped by the unique constraint instead of failing.
+        return PaymentReceipt.objects.bulk_create([
+            PaymentReceipt(payment=payment, image=uploaded, file_hash=file_hash)
+            for uploaded, file_hash in self._receipt_payload
+        ], batch_size=self.RECEIPT_BATCH_SIZE, ignore_conflicts=True)
+
 
 class StaffStatusUpdateForm(forms.Form):
     status = forms.ChoiceField(
@@ -186,7 +251,7 @@ class StaffStatusUpdateForm(forms.Form):
         label='توضیحات',
     )
     counterparty = forms.ModelChoiceField(
-        queryset=Counterparty.objects.all(),
+        queryset=Counterparty.objects.only('id', 'name'),
         required=False,
         label='طرف حساب',
     )
@@ -7,22 +7,21 @@ from django.urls import reverse
 class EnforceCustomerPasswordChangeMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        # Only literal paths here; reverse() and a relative STATIC_URL depend on the
+        # script prefix, which is set per request, so those are resolved in __call__.
+        self.exempt_paths = frozenset({
+            settings.LOGIN_URL,
+            '/accounts/logout/',
+            '/admin/',
+        })
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            password_change_url = reverse('profile_password_change')
-            exempt_paths = {
-                password_change_url,
-                settings.LOGIN_URL,
-                '/accounts/logout/',
-                '/admin/',
-            }
+            path = request.path
             is_exempt = (
-                request.path == password_change_url
-                or request.path.startswith('/admin/')
-                or request.path.startswith(settings.STATIC_URL)
-                or request.path.startswith(settings.MEDIA_URL)
-                or request.path in exempt_paths
+                path in self.exempt_paths
+                or path == reverse('profile_password_change')
+                or path.startswith(('/admin/', settings.STATIC_URL, settings.MEDIA_URL))
             )
             if not is_exempt:
                 profile = getattr(request.user, 'profile', None)
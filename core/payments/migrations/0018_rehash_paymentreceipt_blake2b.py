@@ -0,0 +1,36 @@
+import hashlib
+
+from django.db import migrations
+
+
+def _rehash(apps, hasher):
+    PaymentReceipt = apps.get_model('payments', 'PaymentReceipt')
+    for receipt in PaymentReceipt.objects.exclude(image='').iterator():
+        try:
+            with receipt.image.open('rb') as fileobj:
+                digest = hasher()
+                for chunk in fileobj.chunks():
+                    digest.update(chunk)
+        except (FileNotFoundError, OSError):
+            continue
+        receipt.file_hash = digest.hexdigest()
+        receipt.save(update_fields=['file_hash'])
+
+
+def forwards(apps, schema_editor):
+    _rehash(apps, lambda: hashlib.blake2b(digest_size=32))
+
+
+def backwards(apps, schema_editor):
+    _rehash(apps, hashlib.sha256)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0017_userprofile_force_password_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
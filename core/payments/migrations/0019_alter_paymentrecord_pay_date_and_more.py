@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-15 20:21
+
+from django.db import migrations
+import django_jalali.db.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0018_rehash_paymentreceipt_blake2b'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentrecord',
+            name='pay_date',
+            field=django_jalali.db.models.jDateField(db_index=True, verbose_name='تاریخ واریز'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-15 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0019_alter_paymentrecord_pay_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(fields=['status', '-id'], name='pr_status_id_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(fields=['user', '-id'], name='pr_user_id_desc_idx'),
+        ),
+    ]
@@ -89,6 +89,27 @@ class PaymentRecord(models.Model):
         STATUS_INCOMPLETE: 'ناقص',
     }
 
+    STATUS_FLAG_CLASSES = {
+        STATUS_COMMERCIAL_REVIEW: 'flag-blue',
+        STATUS_FINANCE_REVIEW: 'flag-purple',
+        STATUS_APPROVED: 'flag-green',
+        STATUS_FINAL_APPROVED: 'flag-green',
+        STATUS_REJECTED: 'flag-red',
+        STATUS_INCOMPLETE: 'flag-yellow',
+        STATUS_RETURNED_TO_COMMERCIAL: 'flag-blue',
+    }
+
+    CUSTOMER_FLAG_CLASSES = {
+        STATUS_PENDING: 'flag-blue',
+        STATUS_COMMERCIAL_REVIEW: 'flag-blue',
+        STATUS_FINANCE_REVIEW: 'flag-purple',
+        STATUS_RETURNED_TO_COMMERCIAL: 'flag-blue',
+        STATUS_APPROVED: 'flag-green',
+        STATUS_FINAL_APPROVED: 'flag-green',
+        STATUS_REJECTED: 'flag-red',
+        STATUS_INCOMPLETE: 'flag-yellow',
+    }
+
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     counterparty = models.ForeignKey(Counterparty, on_delete=models.PROTECT, null=True, blank=True, related_name='payments')
     first_name = models.CharField(max_length=50)
@@ -97,7 +118,7 @@ class PaymentRecord(models.Model):
     city = models.CharField(max_length=50)
     phone = models.CharField(max_length=20)
     amount = models.BigIntegerField()
-    pay_date = jmodels.jDateField(verbose_name='تاریخ واریز')
+    pay_date = jmodels.jDateField(verbose_name='تاریخ واریز', db_index=True)
     tracking_code = models.CharField(max_length=50, blank=True, null=True, verbose_name='کد پیگیری')
     payer_account_number = models.CharField(max_length=64, blank=True, default='')
     payer_full_name = models.CharField(max_length=128, blank=True, default='')
@@ -113,6 +134,10 @@ class PaymentRecord(models.Model):
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', '-id'], name='pr_status_id_desc_idx'),
+            models.Index(fields=['user', '-id'], name='pr_user_id_desc_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.amount}"
@@ -123,29 +148,11 @@ class PaymentRecord(models.Model):
 
     @property
     def status_flag_class(self):
-        return {
-            self.STATUS_COMMERCIAL_REVIEW: 'flag-blue',
-            self.STATUS_FINANCE_REVIEW: 'flag-purple',
-            self.STATUS_APPROVED: 'flag-green',
-            self.STATUS_FINAL_APPROVED: 'flag-green',
-            self.STATUS_REJECTED: 'flag-red',
-            self.STATUS_INCOMPLETE: 'flag-yellow',
-            self.STATUS_RETURNED_TO_COMMERCIAL: 'flag-blue',
-        }.get(self.status, 'flag-gray')
+        return self.STATUS_FLAG_CLASSES.get(self.status, 'flag-gray')
 
     @property
     def customer_flag_class(self):
-        if self.status == self.STATUS_FINANCE_REVIEW:
-            return 'flag-purple'
-        if self.status in {self.STATUS_PENDING, self.STATUS_COMMERCIAL_REVIEW, self.STATUS_RETURNED_TO_COMMERCIAL}:
-            return 'flag-blue'
-        if self.status in {self.STATUS_APPROVED, self.STATUS_FINAL_APPROVED}:
-            return 'flag-green'
-        if self.status == self.STATUS_REJECTED:
-            return 'flag-red'
-        if self.status == self.STATUS_INCOMPLETE:
-            return 'flag-yellow'
-        return 'flag-gray'
+        return self.CUSTOMER_FLAG_CLASSES.get(self.status, 'flag-gray')
 
 
 class UserProfile(models.Model):
@@ -1,9 +1,23 @@
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from django.utils import timezone
+from .caching import COUNTERPARTIES_CACHE_KEY, login_ads_cache_key
+from .models import Counterparty, LoginAdvertisement, UserProfile
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=LoginAdvertisement)
+@receiver(post_delete, sender=LoginAdvertisement)
+def clear_login_ads_cache(sender, instance, **kwargs):
+    cache.delete(login_ads_cache_key(timezone.localdate()))
+
+
+@receiver(post_save, sender=Counterparty)
+def clear_counterparties_cache(sender, instance, **kwargs):
+    cache.delete(COUNTERPARTIES_CACHE_KEY)
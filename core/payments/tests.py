@@ -1,3 +1,52 @@
+import itertools
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from .models import PaymentRecord
+from .views import _can_staff_act_on_payment, _is_staff_user, _records_for_list, _user_role
+
+
+class StaffCanActAnnotationTests(TestCase):
+    ROLES = ('customer', 'commercial', 'finance', 'staff')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {}
+        for role in cls.ROLES:
+            user = User.objects.create_user(role, password='pw')
+            user.profile.role = role
+            user.profile.save()
+            cls.users[role] = user
+        cls.users['superuser'] = User.objects.create_superuser('admin', password='pw')
+
+        for status, locked in itertools.product(
+            (value for value, _ in PaymentRecord.STATUS_CHOICES),
+            (False, True),
+        ):
+            PaymentRecord.objects.create(
+                user=cls.users['customer'],
+                first_name='a',
+                last_name='b',
+                organization='o',
+                city='c',
+                phone='1',
+                amount=1000,
+                pay_date='1403-01-01',
+                status=status,
+                locked_by_finance=locked,
+            )
+
+    def test_annotation_matches_python_check(self):
+        for name, user in self.users.items():
+            # Fresh instance so the per-user role memo from earlier iterations does not leak.
+            user = User.objects.get(pk=user.pk)
+            role = _user_role(user) if _is_staff_user(user) else ''
+            records = list(_records_for_list(user))
+            self.assertEqual(len(records), PaymentRecord.objects.count())
+            for payment in records:
+                expected = _can_staff_act_on_payment(
+                    role, payment, is_system_admin=user.is_superuser,
+                ) if role else False
+                with self.subTest(user=name, status=payment.status, locked=payment.locked_by_finance):
+                    self.assertEqual(payment.staff_can_act, expected)
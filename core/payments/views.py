@@ -1,5 +1,7 @@
 ﻿import jdatetime
+from functools import lru_cache
 from openpyxl import Workbook
+from types import MappingProxyType
 from urllib.parse import urlencode
 
 from django.http import HttpResponse, HttpResponseForbidden
@@ -9,13 +11,20 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth import logout as auth_logout
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import BooleanField, Case, Max, Prefetch, Q, Value, When
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from django.views.decorators.http import require_POST
 
+from .caching import cached_counterparties
 from .forms import CounterpartyForm, PaymentRecordForm, StaffStatusUpdateForm
-from .models import Counterparty, PaymentActivityLog, PaymentRecord, PaymentReceipt, UserProfile
+from .models import Counterparty, PaymentActivityLog, PaymentRecord, PaymentReceipt
 
 
+TIMELINE_LENGTH = 5
 STAFF_ROLES = {'staff', 'finance', 'commercial'}
+RECORDS_PER_PAGE = 50
 STATUS_FLAG_META = {
     PaymentRecord.STATUS_COMMERCIAL_REVIEW: ('رویت بازرگانی', 'flag-blue'),
     PaymentRecord.STATUS_FINANCE_REVIEW: ('رویت مالی', 'flag-purple'),
@@ -39,60 +48,145 @@ STATUS_PROGRESS_FLOWS = {
     PaymentRecord.STATUS_INCOMPLETE: [PaymentRecord.STATUS_INCOMPLETE],
     PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL: [PaymentRecord.STATUS_COMMERCIAL_REVIEW, PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL],
 }
-CUSTOMER_STATUSES = [
+# Flags render in this order; each status is one bit so a payment's flags reduce to an int mask.
+FLAG_STATUS_ORDER = (
+    PaymentRecord.STATUS_COMMERCIAL_REVIEW,
+    PaymentRecord.STATUS_FINANCE_REVIEW,
+    PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL,
+    PaymentRecord.STATUS_APPROVED,
+    PaymentRecord.STATUS_FINAL_APPROVED,
+    PaymentRecord.STATUS_REJECTED,
+    PaymentRecord.STATUS_INCOMPLETE,
+)
+STATUS_FLAG_BITS = {code: 1 << index for index, code in enumerate(FLAG_STATUS_ORDER)}
+STATUS_PROGRESS_MASKS = {
+    status: STATUS_FLAG_BITS[status] | sum(STATUS_FLAG_BITS[step] for step in steps)
+    for status, steps in STATUS_PROGRESS_FLOWS.items()
+}
+# Flag rows for every possible mask, shared by all payments and only read by the template.
+FLAG_ROWS = tuple(
+    tuple(
+        {'label': STATUS_FLAG_META[code][0], 'css': STATUS_FLAG_META[code][1]}
+        for code in FLAG_STATUS_ORDER
+        if mask & STATUS_FLAG_BITS[code]
+    )
+    for mask in range(1 << len(FLAG_STATUS_ORDER))
+)
+FILTER_KEYS = frozenset({
+    'first_name',
+    'last_name',
+    'phone',
+    'city',
+    'tracking_code',
+    'payer_account_number',
+    'payer_full_name',
+    'payer_bank_name',
+    'amount',
+    'pay_date',
+    'status',
+    'counterparty',
+})
+EMPTY_FILTERS = MappingProxyType(dict.fromkeys(FILTER_KEYS, ''))
+VALID_STATUSES = frozenset(value for value, _ in PaymentRecord.STATUS_CHOICES)
+STATUS_LABELS = dict(PaymentRecord.STATUS_CHOICES)
+STAFF_ROLE_LABELS = {
+    'commercial': 'بازرگانی',
+    'finance': 'مالی',
+    'staff': 'کارمندی',
+}
+ROLE_TITLES = {
+    'commercial': 'کاربر بازرگانی',
+    'finance': 'کاربر مالی',
+    'staff': 'کاربر کارمند',
+    'customer': 'مشتری',
+}
+CUSTOMER_STATUSES = (
     (PaymentRecord.STATUS_PENDING, 'در حال بررسی'),
     (PaymentRecord.STATUS_FINAL_APPROVED, 'تایید نهایی'),
     (PaymentRecord.STATUS_REJECTED, 'رد شده'),
     (PaymentRecord.STATUS_INCOMPLETE, 'ناقص'),
-]
+)
+COMMERCIAL_ACTIONABLE_STATUSES = frozenset({PaymentRecord.STATUS_PENDING, PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL})
+# Statuses each unit may move a record to; other staff roles get the full STATUS_CHOICES.
+STAFF_STATUS_CHOICES = {
+    'commercial': (
+        (PaymentRecord.STATUS_COMMERCIAL_REVIEW, 'تایید بازرگانی'),
+        (PaymentRecord.STATUS_INCOMPLETE, 'ناقص'),
+        (PaymentRecord.STATUS_REJECTED, 'رد شده'),
+    ),
+    'finance': (
+        (PaymentRecord.STATUS_FINANCE_REVIEW, 'تایید مالی'),
+        (PaymentRecord.STATUS_FINAL_APPROVED, 'تایید نهایی'),
+        (PaymentRecord.STATUS_INCOMPLETE, 'ناقص'),
+        (PaymentRecord.STATUS_REJECTED, 'رد شده'),
+        (PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL, 'عودت به بازرگانی'),
+    ),
+}
+# Each status a customer can filter by covers the internal statuses shown under that label.
+CUSTOMER_STATUS_FILTERS = {
+    PaymentRecord.STATUS_PENDING: frozenset({
+        PaymentRecord.STATUS_PENDING,
+        PaymentRecord.STATUS_COMMERCIAL_REVIEW,
+        PaymentRecord.STATUS_FINANCE_REVIEW,
+        PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL,
+    }),
+    PaymentRecord.STATUS_FINAL_APPROVED: frozenset({
+        PaymentRecord.STATUS_APPROVED,
+        PaymentRecord.STATUS_FINAL_APPROVED,
+    }),
+    PaymentRecord.STATUS_REJECTED: frozenset({PaymentRecord.STATUS_REJECTED}),
+    PaymentRecord.STATUS_INCOMPLETE: frozenset({PaymentRecord.STATUS_INCOMPLETE}),
+}
+SORT_QUERY_KEYS = frozenset({'sort', 'dir', 'page'})
+PAGE_QUERY_KEYS = frozenset({'page'})
+SORTABLE_FIELDS = {
+    'payer_full_name': 'payer_full_name',
+    'pay_date': 'pay_date',
+    'tracking_code': 'tracking_code',
+    'amount': 'amount',
+    'payer_bank_name': 'payer_bank_name',
+    'status': 'status',
+}
 
 
 def _user_role(user):
+    # Same per-request memo as _is_staff_user; a missing profile is not cached by Django.
+    cached = getattr(user, '_user_role_cache', None)
+    if cached is not None:
+        return cached
     if not user.is_authenticated:
-        return ''
-    if user.is_superuser:
-        return 'staff'
-    try:
-        return user.profile.role
-    except UserProfile.DoesNotExist:
-        return 'staff' if user.is_staff else 'customer'
+        role = ''
+    elif user.is_superuser:
+        role = 'staff'
+    else:
+        profile = getattr(user, 'profile', None)
+        role = profile.role if profile else ('staff' if user.is_staff else 'customer')
+    user._user_role_cache = role
+    return role
 
 
 def _staff_role_label(role):
-    return {
-        'commercial': 'بازرگانی',
-        'finance': 'مالی',
-        'staff': 'کارمندی',
-    }.get(role, '')
+    return STAFF_ROLE_LABELS.get(role, '')
 
 
 def _is_staff_user(user):
+    # Views and templates ask this several times per request; keep the answer on the user.
+    cached = getattr(user, '_is_staff_user_cache', None)
+    if cached is not None:
+        return cached
     if not user.is_authenticated:
-        return False
-    if user.is_staff or user.is_superuser:
-        return True
-    try:
-        return user.profile.role in STAFF_ROLES
-    except UserProfile.DoesNotExist:
-        return False
+        result = False
+    elif user.is_staff or user.is_superuser:
+        result = True
+    else:
+        profile = getattr(user, 'profile', None)
+        result = bool(profile and profile.role in STAFF_ROLES)
+    user._is_staff_user_cache = result
+    return result
 
 
 def _staff_status_choices_for_role(role):
-    if role == 'commercial':
-        return [
-            (PaymentRecord.STATUS_COMMERCIAL_REVIEW, 'تایید بازرگانی'),
-            (PaymentRecord.STATUS_INCOMPLETE, 'ناقص'),
-            (PaymentRecord.STATUS_REJECTED, 'رد شده'),
-        ]
-    if role == 'finance':
-        return [
-            (PaymentRecord.STATUS_FINANCE_REVIEW, 'تایید مالی'),
-            (PaymentRecord.STATUS_FINAL_APPROVED, 'تایید نهایی'),
-            (PaymentRecord.STATUS_INCOMPLETE, 'ناقص'),
-            (PaymentRecord.STATUS_REJECTED, 'رد شده'),
-            (PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL, 'عودت به بازرگانی'),
-        ]
-    return PaymentRecord.STATUS_CHOICES
+    return STAFF_STATUS_CHOICES.get(role, PaymentRecord.STATUS_CHOICES)
 
 
 def _can_staff_act_on_payment(role, payment, is_system_admin=False):
@@ -101,24 +195,60 @@ def _can_staff_act_on_payment(role, payment, is_system_admin=False):
     if payment.locked_by_finance:
         return False
     if role == 'commercial':
-        return payment.status in {PaymentRecord.STATUS_PENDING, PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL}
+        return payment.status in COMMERCIAL_ACTIONABLE_STATUSES
     if role == 'finance':
         return True
     return True
 
 
+def _staff_can_act_expression(role, is_system_admin=False):
+    # SQL twin of _can_staff_act_on_payment for annotating list rows.
+    if not role:
+        return Value(False)
+    if is_system_admin:
+        return Value(True)
+    condition = Q(locked_by_finance=False)
+    if role == 'commercial':
+        condition &= Q(status__in=COMMERCIAL_ACTIONABLE_STATUSES)
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
 def _records_for_user(user):
-    qs = PaymentRecord.objects.select_related('counterparty', 'user').prefetch_related('receipts', 'activity_logs')
+    qs = PaymentRecord.objects.select_related('counterparty')
     if _is_staff_user(user):
         return qs.order_by('-id')
     return qs.filter(user=user).order_by('-id')
 
 
+def _records_for_list(user):
+    # The list shows the counterparty by name only and never reads the uploader or created_at.
+    # Only the latest TIMELINE_LENGTH logs are rendered; flags and receipt links come from _enrich_records.
+    # _log_text reads the actor's role and display name; both come back in the same query.
+    recent_logs = (
+        PaymentActivityLog.objects
+        .select_related('actor', 'actor__profile')
+        .only('payment_id', 'action', 'to_status', 'note', 'created_at', 'actor__profile__role')
+        .annotate(actor_display=Coalesce(
+            NullIf(Trim(Concat('actor__first_name', Value(' '), 'actor__last_name')), Value('')),
+            'actor__username',
+        ))
+    )[:TIMELINE_LENGTH]
+    staff_role = _user_role(user) if _is_staff_user(user) else ''
+    return (
+        _records_for_user(user)
+        .annotate(staff_can_act=_staff_can_act_expression(staff_role, is_system_admin=user.is_superuser))
+        .defer('created_at', 'counterparty__description', 'counterparty__created_at', 'counterparty__updated_at')
+        .prefetch_related(Prefetch('activity_logs', queryset=recent_logs, to_attr='recent_logs'))
+    )
+
+
+@lru_cache(maxsize=256)
 def _parse_jalali_date(date_text):
     if not date_text:
         return None
     try:
-        return jdatetime.datetime.strptime(date_text, '%Y/%m/%d').date()
+        year, month, day = date_text.split('/')
+        return jdatetime.date(int(year), int(month), int(day))
     except ValueError:
         return None
 
@@ -137,16 +267,9 @@ def _log_activity(payment, actor, action, from_status='', to_status='', note='')
 def _role_title(user):
     if not user:
         return 'کاربر'
-    try:
-        role = user.profile.role
-    except UserProfile.DoesNotExist:
-        role = ''
-    return {
-        'commercial': 'کاربر بازرگانی',
-        'finance': 'کاربر مالی',
-        'staff': 'کاربر کارمند',
-        'customer': 'مشتری',
-    }.get(role, 'کاربر')
+    profile = getattr(user, 'profile', None)
+    role = profile.role if profile else ''
+    return ROLE_TITLES.get(role, 'کاربر')
 
 
 def _display_name(user):
@@ -157,7 +280,8 @@ def _display_name(user):
 
 
 def _log_text(log):
-    actor = _display_name(log.actor)
+    # List logs carry the name precomputed by _records_for_list; a missing actor stays 'سیستم'.
+    actor = getattr(log, 'actor_display', None) or _display_name(log.actor)
     role = _role_title(log.actor)
     if log.action == PaymentActivityLog.ACTION_VIEWED:
         return f"{role} ({actor}) سند را مشاهده کرد."
@@ -166,73 +290,61 @@ def _log_text(log):
     if log.action == PaymentActivityLog.ACTION_EDITED:
         return f"{role} ({actor}) سند را ویرایش کرد."
     if log.action == PaymentActivityLog.ACTION_STATUS_CHANGED:
-        status_labels = dict(PaymentRecord.STATUS_CHOICES)
-        status_text = status_labels.get(log.to_status, log.to_status)
+        status_text = STATUS_LABELS.get(log.to_status, log.to_status)
         return f"{role} ({actor}) وضعیت سند را به «{status_text}» تغییر داد."
     return f"{role} ({actor}) عملیاتی انجام داد."
 
 
-def _enrich_records(records, staff_role='', is_system_admin=False):
-    status_order = [
-        PaymentRecord.STATUS_COMMERCIAL_REVIEW,
-        PaymentRecord.STATUS_FINANCE_REVIEW,
-        PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL,
-        PaymentRecord.STATUS_APPROVED,
-        PaymentRecord.STATUS_FINAL_APPROVED,
-        PaymentRecord.STATUS_REJECTED,
-        PaymentRecord.STATUS_INCOMPLETE,
-    ]
+def _enrich_records(records, staff_role=''):
     records = list(records)
+    payment_ids = [payment.pk for payment in records]
+    # Plain URL strings per payment; the list only links receipts, so skip building PaymentReceipt objects.
+    receipt_storage = PaymentReceipt._meta.get_field('image').storage
+    receipt_urls = {}
+    receipt_rows = (
+        PaymentReceipt.objects
+        .filter(payment_id__in=payment_ids)
+        .order_by('id')
+        .values_list('payment_id', 'image')
+    )
+    for payment_id, name in receipt_rows:
+        if name:
+            receipt_urls.setdefault(payment_id, []).append(receipt_storage.url(name))
+    # Flags need every status a payment ever reached, not just the rendered timeline rows.
+    reached_masks = {}
+    reached_rows = (
+        PaymentActivityLog.objects
+        .filter(payment_id__in=payment_ids, to_status__in=STATUS_FLAG_BITS)
+        .order_by()
+        .values_list('payment_id', 'to_status')
+        .distinct()
+    )
+    for payment_id, to_status in reached_rows:
+        reached_masks[payment_id] = reached_masks.get(payment_id, 0) | STATUS_FLAG_BITS[to_status]
+    staff_allowed_choices = _staff_status_choices_for_role(staff_role) if staff_role else ()
     for payment in records:
-        reached = set()
-        for log in payment.activity_logs.all():
-            if log.to_status in STATUS_FLAG_META:
-                reached.add(log.to_status)
-        if payment.status in STATUS_FLAG_META:
-            reached.add(payment.status)
-            for step in STATUS_PROGRESS_FLOWS.get(payment.status, []):
-                reached.add(step)
-
-        payment.row_flags = [
-            {
-                'label': STATUS_FLAG_META[code][0],
-                'css': STATUS_FLAG_META[code][1],
-            }
-            for code in status_order
-            if code in reached
-        ]
+        payment.receipt_urls = receipt_urls.get(payment.pk, [])
+        payment.row_flags = FLAG_ROWS[reached_masks.get(payment.pk, 0) | STATUS_PROGRESS_MASKS.get(payment.status, 0)]
         payment.timeline_lines = [
             {
                 'time': log.created_at,
                 'text': _log_text(log),
                 'note': log.note,
             }
-            for log in payment.activity_logs.all()[:5]
+            for log in payment.recent_logs
         ]
-        payment.staff_can_act = _can_staff_act_on_payment(
-            staff_role,
-            payment,
-            is_system_admin=is_system_admin,
-        ) if staff_role else False
-        payment.staff_allowed_choices = _staff_status_choices_for_role(staff_role) if staff_role else []
+        payment.staff_allowed_choices = staff_allowed_choices
     return records
 
 
 def _apply_record_filters(records, request, is_staff_user):
-    filters = {
-        'first_name': (request.GET.get('first_name') or '').strip(),
-        'last_name': (request.GET.get('last_name') or '').strip(),
-        'phone': (request.GET.get('phone') or '').strip(),
-        'city': (request.GET.get('city') or '').strip(),
-        'tracking_code': (request.GET.get('tracking_code') or '').strip(),
-        'payer_account_number': (request.GET.get('payer_account_number') or '').strip(),
-        'payer_full_name': (request.GET.get('payer_full_name') or '').strip(),
-        'payer_bank_name': (request.GET.get('payer_bank_name') or '').strip(),
-        'amount': (request.GET.get('amount') or '').replace(',', '').strip(),
-        'pay_date': (request.GET.get('pay_date') or '').strip(),
-        'status': (request.GET.get('status') or '').strip(),
-        'counterparty': (request.GET.get('counterparty') or '').strip(),
-    }
+    # Most list loads carry no filter at all (at most sort/dir).
+    if FILTER_KEYS.isdisjoint(request.GET):
+        return records, EMPTY_FILTERS
+
+    params = request.GET.dict()
+    filters = {key: (params.get(key) or '').strip() for key in FILTER_KEYS}
+    filters['amount'] = filters['amount'].replace(',', '').strip()
 
     if is_staff_user:
         if filters['first_name']:
@@ -268,45 +380,32 @@ def _apply_record_filters(records, request, is_staff_user):
     if parsed_date:
         records = records.filter(pay_date=parsed_date)
 
-    valid_statuses = {choice[0] for choice in PaymentRecord.STATUS_CHOICES}
     if is_staff_user:
-        if filters['status'] in valid_statuses:
+        if filters['status'] in VALID_STATUSES:
             records = records.filter(status=filters['status'])
     else:
-        customer_status_map = {
-            PaymentRecord.STATUS_PENDING: [
-                PaymentRecord.STATUS_PENDING,
-                PaymentRecord.STATUS_COMMERCIAL_REVIEW,
-                PaymentRecord.STATUS_FINANCE_REVIEW,
-                PaymentRecord.STATUS_RETURNED_TO_COMMERCIAL,
-            ],
-            PaymentRecord.STATUS_FINAL_APPROVED: [
-                PaymentRecord.STATUS_APPROVED,
-                PaymentRecord.STATUS_FINAL_APPROVED,
-            ],
-            PaymentRecord.STATUS_REJECTED: [PaymentRecord.STATUS_REJECTED],
-            PaymentRecord.STATUS_INCOMPLETE: [PaymentRecord.STATUS_INCOMPLETE],
-        }
-        if filters['status'] in customer_status_map:
-            records = records.filter(status__in=customer_status_map[filters['status']])
+        if filters['status'] in CUSTOMER_STATUS_FILTERS:
+            records = records.filter(status__in=CUSTOMER_STATUS_FILTERS[filters['status']])
 
     return records, filters
 
+def _query_without(params, excluded):
+    # Encode straight from the QueryDict lists instead of copying it just to pop a few keys.
+    return urlencode([
+        (key, value)
+        for key, values in params.lists()
+        if key not in excluded
+        for value in values
+    ])
+
+
 def _apply_record_sort(records, request):
-    sortable_fields = {
-        'payer_full_name': 'payer_full_name',
-        'pay_date': 'pay_date',
-        'tracking_code': 'tracking_code',
-        'amount': 'amount',
-        'payer_bank_name': 'payer_bank_name',
-        'status': 'status',
-    }
     current_sort = (request.GET.get('sort') or '').strip()
     current_dir = (request.GET.get('dir') or 'desc').strip().lower()
     if current_dir not in {'asc', 'desc'}:
         current_dir = 'desc'
 
-    sort_field = sortable_fields.get(current_sort)
+    sort_field = SORTABLE_FIELDS.get(current_sort)
     if sort_field:
         prefix = '' if current_dir == 'asc' else '-'
         records = records.order_by(f'{prefix}{sort_field}', '-id')
@@ -315,10 +414,7 @@ def _apply_record_sort(records, request):
         current_sort = ''
         current_dir = 'desc'
 
-    query_params = request.GET.copy()
-    query_params.pop('sort', None)
-    query_params.pop('dir', None)
-    base_query = urlencode(query_params, doseq=True)
+    base_query = _query_without(request.GET, SORT_QUERY_KEYS)
 
     return records, current_sort, current_dir, base_query
 
@@ -334,98 +430,40 @@ def _account_initial_data(user, profile, payment=None):
 
 
 def _save_receipts(payment, form):
-    payload = form.receipt_payload()
-    if not payload:
-        return
+    return form.create_receipts(payment)
 
-    receipts = [
-        PaymentReceipt(payment=payment, image=uploaded, file_hash=file_hash)
-        for uploaded, file_hash in payload
-    ]
-    PaymentReceipt.objects.bulk_create(receipts)
 
+SOURCE_PROFILE_FIELDS = ('payer_account_number', 'payer_full_name', 'payer_bank_name')
+DESTINATION_PROFILE_FIELDS = ('beneficiary_bank_name', 'beneficiary_account_number', 'beneficiary_account_owner')
 
-def _source_profiles_for_user(user):
+
+def _distinct_profiles(user, fields):
+    # One row per distinct combination, most recently used first; blanks and the legacy Z placeholder are skipped.
     if not user or not user.is_authenticated:
         return []
-    records = (
-        PaymentRecord.objects
-        .filter(user=user)
-        .values(
-            'payer_account_number',
-            'payer_full_name',
-            'payer_bank_name',
-        )
-        .order_by('-id')
+    records = PaymentRecord.objects.filter(user=user)
+    for field in fields:
+        records = records.exclude(**{f'{field}__in': ('', 'Z')})
+    return list(
+        records
+        .values(*fields)
+        .annotate(last_used=Max('id'))
+        .order_by('-last_used')
+        .values(*fields)
     )
-    seen = set()
-    profiles = []
-    for row in records:
-        values = {
-            'payer_account_number': (row.get('payer_account_number') or '').strip(),
-            'payer_full_name': (row.get('payer_full_name') or '').strip(),
-            'payer_bank_name': (row.get('payer_bank_name') or '').strip(),
-        }
-        if not all(values.values()):
-            continue
-        if 'Z' in values.values():
-            continue
-        key = tuple(values[field] for field in (
-            'payer_account_number',
-            'payer_full_name',
-            'payer_bank_name',
-        ))
-        if key in seen:
-            continue
-        seen.add(key)
-        profiles.append(values)
-    return profiles
+
+
+def _source_profiles_for_user(user):
+    return _distinct_profiles(user, SOURCE_PROFILE_FIELDS)
 
 
 def _destination_profiles_for_user(user):
-    if not user or not user.is_authenticated:
-        return []
-    records = (
-        PaymentRecord.objects
-        .filter(user=user)
-        .values(
-            'beneficiary_bank_name',
-            'beneficiary_account_number',
-            'beneficiary_account_owner',
-        )
-        .order_by('-id')
-    )
-    seen = set()
-    profiles = []
-    for row in records:
-        values = {
-            'beneficiary_bank_name': (row.get('beneficiary_bank_name') or '').strip(),
-            'beneficiary_account_number': (row.get('beneficiary_account_number') or '').strip(),
-            'beneficiary_account_owner': (row.get('beneficiary_account_owner') or '').strip(),
-        }
-        if not all(values.values()):
-            continue
-        if 'Z' in values.values():
-            continue
-        key = tuple(values[field] for field in (
-            'beneficiary_bank_name',
-            'beneficiary_account_number',
-            'beneficiary_account_owner',
-        ))
-        if key in seen:
-            continue
-        seen.add(key)
-        profiles.append(values)
-    return profiles
+    return _distinct_profiles(user, DESTINATION_PROFILE_FIELDS)
 
 
 @login_required
 def create_payment(request):
-    profile = None
-    try:
-        profile = request.user.profile
-    except UserProfile.DoesNotExist:
-        profile = None
+    profile = getattr(request.user, 'profile', None)
 
     initial_data = _account_initial_data(request.user, profile)
     is_staff_user = _is_staff_user(request.user)
@@ -445,17 +483,19 @@ def create_payment(request):
             payment.city = initial_data['city']
             payment.phone = initial_data['phone']
             payment.status = PaymentRecord.STATUS_PENDING
-            payment.save()
-            _save_receipts(payment, form)
-            _log_activity(payment, request.user, PaymentActivityLog.ACTION_CREATED, to_status=payment.status)
+            with transaction.atomic():
+                payment.save()
+                _save_receipts(payment, form)
+                _log_activity(payment, request.user, PaymentActivityLog.ACTION_CREATED, to_status=payment.status)
             return redirect('success')
     else:
         form = PaymentRecordForm(initial=initial_data)
 
-    records = _records_for_user(request.user)
+    records = _records_for_list(request.user)
     records, active_filters = _apply_record_filters(records, request, is_staff_user)
     records, current_sort, current_sort_dir, sort_base_query = _apply_record_sort(records, request)
-    records = _enrich_records(records, staff_role=staff_role, is_system_admin=is_system_admin)
+    page_obj = Paginator(records, RECORDS_PER_PAGE).get_page(request.GET.get('page'))
+    records = _enrich_records(page_obj.object_list, staff_role=staff_role)
     user_display_name = f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
 
     return render(request, 'payments/form.html', {
@@ -464,7 +504,7 @@ def create_payment(request):
         'is_staff_user': is_staff_user,
         'filters': active_filters,
         'status_choices': PaymentRecord.STATUS_CHOICES if is_staff_user else CUSTOMER_STATUSES,
-        'counterparties': Counterparty.objects.all() if is_staff_user else [],
+        'counterparties': cached_counterparties() if is_staff_user else [],
         'staff_user_role': staff_role,
         'staff_role_label': _staff_role_label(staff_role),
         'can_manage_counterparties': is_system_admin,
@@ -476,14 +516,15 @@ def create_payment(request):
         'current_sort': current_sort,
         'current_sort_dir': current_sort_dir,
         'sort_base_query': sort_base_query,
+        'page_obj': page_obj,
+        'page_base_query': _query_without(request.GET, PAGE_QUERY_KEYS),
         'customer_info': initial_data,
     })
 
 
 @login_required
 def success(request):
-    records = _records_for_user(request.user)
-    return render(request, 'payments/success.html', {'records': records})
+    return render(request, 'payments/success.html')
 
 
 @login_required
@@ -531,7 +572,11 @@ def staff_update_status(request, payment_id):
         messages.error(request, 'شما دسترسی بررسی اسناد را ندارید.')
         return redirect(redirect_target)
 
-    payment = get_object_or_404(PaymentRecord, id=payment_id)
+    # Only the columns the permission check and the status write touch.
+    payment = get_object_or_404(
+        PaymentRecord.objects.only('id', 'status', 'locked_by_finance', 'counterparty_id'),
+        id=payment_id,
+    )
     staff_role = _user_role(request.user)
     if not _can_staff_act_on_payment(staff_role, payment, is_system_admin=request.user.is_superuser):
         messages.error(request, 'در وضعیت فعلی، امکان تغییر این سند برای شما وجود ندارد.')
@@ -571,16 +616,22 @@ def staff_update_status(request, payment_id):
     if selected_counterparty and staff_role in {'commercial', 'staff'}:
         payment.counterparty = selected_counterparty
 
-    payment.save(update_fields=['status', 'last_staff_note', 'counterparty', 'locked_by_finance'])
-
-    _log_activity(
-        payment,
-        request.user,
-        PaymentActivityLog.ACTION_STATUS_CHANGED,
-        from_status=from_status,
-        to_status=payment.status,
-        note=payment.last_staff_note,
-    )
+    # The status write and its log entry commit together.
+    with transaction.atomic():
+        PaymentRecord.objects.filter(pk=payment.pk).update(
+            status=payment.status,
+            last_staff_note=payment.last_staff_note,
+            counterparty=payment.counterparty_id,
+            locked_by_finance=payment.locked_by_finance,
+        )
+        _log_activity(
+            payment,
+            request.user,
+            PaymentActivityLog.ACTION_STATUS_CHANGED,
+            from_status=from_status,
+            to_status=payment.status,
+            note=payment.last_staff_note,
+        )
 
     messages.success(request, 'وضعیت سند با موفقیت ثبت شد.')
     return redirect(redirect_target)
@@ -588,22 +639,18 @@ def staff_update_status(request, payment_id):
 
 @login_required
 def edit_payment(request, payment_id):
-    payment = get_object_or_404(PaymentRecord, id=payment_id)
-
     if _is_staff_user(request.user):
         return HttpResponseForbidden('کاربران واحدها امکان ویرایش سند مشتری را ندارند.')
 
+    payment = get_object_or_404(PaymentRecord, id=payment_id)
+
     if payment.user_id != request.user.id:
         return HttpResponseForbidden('فقط امکان ویرایش اسناد ثبت شده توسط خودتان وجود دارد.')
 
     if payment.status != PaymentRecord.STATUS_INCOMPLETE:
         return HttpResponseForbidden('فقط اسناد با وضعیت «ناقص» قابل ویرایش هستند.')
 
-    profile = None
-    try:
-        profile = request.user.profile
-    except UserProfile.DoesNotExist:
-        profile = None
+    profile = getattr(request.user, 'profile', None)
 
     initial_data = _account_initial_data(request.user, profile, payment=payment)
 
@@ -620,9 +667,10 @@ def edit_payment(request, payment_id):
             from_status = payment.status
             payment.status = PaymentRecord.STATUS_PENDING
             payment.locked_by_finance = False
-            payment.save()
-            _save_receipts(payment, form)
-            _log_activity(payment, request.user, PaymentActivityLog.ACTION_EDITED, from_status=from_status, to_status=payment.status)
+            with transaction.atomic():
+                payment.save()
+                _save_receipts(payment, form)
+                _log_activity(payment, request.user, PaymentActivityLog.ACTION_EDITED, from_status=from_status, to_status=payment.status)
             return redirect('submit')
     else:
         form = PaymentRecordForm(instance=payment, initial=initial_data)
@@ -639,13 +687,14 @@ def edit_payment(request, payment_id):
 @login_required
 def payment_timeline(request, payment_id):
     payment = get_object_or_404(PaymentRecord.objects.select_related('user', 'counterparty'), id=payment_id)
-    if not _is_staff_user(request.user) and payment.user_id != request.user.id:
+    is_staff_user = _is_staff_user(request.user)
+    if not is_staff_user and payment.user_id != request.user.id:
         return HttpResponseForbidden('فقط امکان مشاهده تاریخچه اسناد خودتان وجود دارد.')
 
     _log_activity(payment, request.user, PaymentActivityLog.ACTION_VIEWED, note='مشاهده تاریخچه')
-    logs = payment.activity_logs.select_related('actor').all()
+    logs = payment.activity_logs.select_related('actor', 'actor__profile').all()
 
-    return render(request, 'payments/timeline.html', {'payment': payment, 'logs': logs, 'is_staff_user': _is_staff_user(request.user)})
+    return render(request, 'payments/timeline.html', {'payment': payment, 'logs': logs, 'is_staff_user': is_staff_user})
 
 
 @login_required
@@ -700,9 +749,9 @@ def export_records(request):
     )
     response['Content-Disposition'] = 'attachment; filename="payment_records.xlsx"'
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Payments'
+    # Write-only mode streams rows to the sheet XML instead of keeping every cell in memory.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Payments')
 
     ws.append([
         'ID',
@@ -726,27 +775,55 @@ def export_records(request):
         'تاریخ ثبت',
     ])
 
-    for payment in records:
+    # Plain tuples: the export never needs model instances, only these columns.
+    rows = records.values_list(
+        'id',
+        'user__first_name',
+        'user__last_name',
+        'user__username',
+        'first_name',
+        'last_name',
+        'payer_full_name',
+        'payer_account_number',
+        'payer_bank_name',
+        'beneficiary_bank_name',
+        'beneficiary_account_number',
+        'beneficiary_account_owner',
+        'organization',
+        'city',
+        'phone',
+        'amount',
+        'pay_date',
+        'tracking_code',
+        'counterparty__name',
+        'created_at',
+    )
+    for (
+        pk, user_first_name, user_last_name, username, first_name, last_name,
+        payer_full_name, payer_account_number, payer_bank_name, beneficiary_bank_name,
+        beneficiary_account_number, beneficiary_account_owner, organization, city, phone,
+        amount, pay_date, tracking_code, counterparty_name, created_at,
+    ) in rows.iterator(chunk_size=2000):
         ws.append([
-            payment.id,
-            payment.user.get_full_name() if payment.user else '',
-            payment.user.username if payment.user else '',
-            payment.first_name,
-            payment.last_name,
-            payment.payer_full_name,
-            payment.payer_account_number,
-            payment.payer_bank_name,
-            payment.beneficiary_bank_name,
-            payment.beneficiary_account_number,
-            payment.beneficiary_account_owner,
-            payment.organization,
-            payment.city,
-            payment.phone,
-            payment.amount,
-            str(payment.pay_date),
-            payment.tracking_code or '',
-            payment.counterparty.name if payment.counterparty else '',
-            payment.created_at.strftime('%Y-%m-%d %H:%M:%S') if payment.created_at else '',
+            pk,
+            f"{user_first_name or ''} {user_last_name or ''}".strip(),
+            username or '',
+            first_name,
+            last_name,
+            payer_full_name,
+            payer_account_number,
+            payer_bank_name,
+            beneficiary_bank_name,
+            beneficiary_account_number,
+            beneficiary_account_owner,
+            organization,
+            city,
+            phone,
+            amount,
+            str(pay_date),
+            tracking_code or '',
+            counterparty_name or '',
+            created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else '',
         ])
 
     wb.save(response)